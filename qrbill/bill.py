@@ -1,20 +1,17 @@
-import re
 import warnings
 from decimal import Decimal
-from io import BytesIO
+from functools import lru_cache
 from itertools import chain
 from pathlib import Path
 
-import qrcode
-import qrcode.image.svg
-import svgwrite
-from iso3166 import countries
 from stdnum import iban, iso11649
 from stdnum.ch import esr
+from stdnum.exceptions import ValidationError
 
 IBAN_ALLOWED_COUNTRIES = ['CH', 'LI']
 QR_IID = {"start": 30000, "end": 31999}
-AMOUNT_REGEX = r'^\d{1,9}\.\d{2}$'
+# A -> '10', B -> '11', ..., Z -> '35' for IBAN check digits computation
+IBAN_LETTERS_TO_DIGITS = str.maketrans({chr(code): str(code - 55) for code in range(ord('A'), ord('Z') + 1)})
 
 MM_TO_UU = 3.543307
 BILL_HEIGHT = 106  # 105mm + 1mm for horizontal scissors to show up.
@@ -23,6 +20,8 @@ PAYMENT_WIDTH = '148mm'
 MAX_CHARS_PAYMENT_LINE = 72
 MAX_CHARS_RECEIPT_LINE = 38
 A4 = ('210mm', '297mm')
+# QR data placeholder for a missing address (address type + 6 fields)
+EMPTY_ADDRESS_DATA = ('',) * 7
 
 # Annex D: Multilingual headings
 LABELS = {
@@ -55,6 +54,12 @@ LABELS = {
     },
     'In favour of': {'de': 'Zugunsten', 'fr': 'En faveur de', 'it': 'A favore di'},
 }
+# Same headings, indexed by language first
+LABELS_BY_LANG = {
+    lang: {txt: translations[lang] for txt, translations in LABELS.items()}
+    for lang in ('de', 'fr', 'it')
+}
+LABELS_BY_LANG['en'] = {txt: txt for txt in LABELS}
 
 SCISSORS_SVG_PATH = (
     'm 0.764814,4.283977 c 0.337358,0.143009 0.862476,-0.115279 0.775145,-0.523225 -0.145918,-0.497473 '
@@ -76,7 +81,31 @@ SCISSORS_SVG_PATH = (
 )
 
 
+# Most common values, including the country as written in an address in a local language
+COUNTRY_ALIASES = {
+    '': 'CH', 'ch': 'CH', 'schweiz': 'CH', 'suisse': 'CH', 'svizzera': 'CH', 'svizra': 'CH',
+    'li': 'LI', 'fürstentum liechtenstein': 'LI',
+}
+
+
+@lru_cache(maxsize=512)
+def _resolve_country(country):
+    """
+    Return the ISO 3166 alpha2 code of `country`, or None if the country cannot
+    be resolved. Results are cached, as most bills share the same few countries.
+    """
+    # Imported on first use, common Swiss/Liechtenstein values don't need it.
+    from iso3166 import countries
+
+    try:
+        return countries.get(country).alpha2
+    except KeyError:
+        return None
+
+
 class Address:
+    __slots__ = ('name', 'country')
+
     @classmethod
     def create(cls, **kwargs):
         if kwargs.get('line1') or kwargs.get('line2'):
@@ -94,15 +123,10 @@ class Address:
     @staticmethod
     def parse_country(country):
         country = (country or '').strip()
-        # allow users to write the country as if used in an address in the local language
-        if not country or country.lower() in ['schweiz', 'suisse', 'svizzera', 'svizra']:
-            country = 'CH'
-        if country.lower() in ['fürstentum liechtenstein']:
-            country = 'LI'
-        try:
-            return countries.get(country).alpha2
-        except KeyError:
+        alpha2 = COUNTRY_ALIASES.get(country.lower()) or _resolve_country(country)
+        if alpha2 is None:
             raise ValueError("The country code '%s' is not an ISO 3166 valid code" % country)
+        return alpha2
 
     @staticmethod
     def _split(line, max_chars):
@@ -115,46 +139,60 @@ class Address:
         if len(line) <= max_chars:
             return [line]
         else:
-            chunks = line.split(' ')
             lines = []
-            line2 = ''
-            while chunks:
-                if line2 and len(line2 + chunks[0]) + 1 > max_chars:
-                    lines.append(line2)
-                    line2 = ''
-                line2 += (' ' if line2 else '') + chunks[0]
-                chunks = chunks[1:]
-            if line2:
-                lines.append(line2)
+            words = []
+            length = 0  # Length of ' '.join(words)
+            for word in line.split(' '):
+                if not length:
+                    words = [word]
+                    length = len(word)
+                elif length + len(word) + 1 > max_chars:
+                    lines.append(' '.join(words))
+                    words = [word]
+                    length = len(word)
+                else:
+                    words.append(word)
+                    length += len(word) + 1
+            if length:
+                lines.append(' '.join(words))
             return lines
 
+    def data_list(self):
+        """Return address values as a tuple, appropriate for qr generation."""
+        return self._data_list()
+
+    def as_paragraph(self, max_chars=MAX_CHARS_PAYMENT_LINE):
+        """Return address lines for printing, split at `max_chars`."""
+        return tuple(chain.from_iterable(self._split(line, max_chars) for line in self._lines()))
+
 
 class CombinedAddress(Address):
     """
     Combined address
     (name, line1, line2, country)
     """
+    __slots__ = ('line1', 'line2')
     combined = True
 
     def __init__(self, *, name=None, line1=None, line2=None, country=None):
         self.name = (name or '').strip()
         self.line1 = (line1 or '').strip()
-        if not (0 <= len(self.line1) <= 70):
+        if len(self.line1) > 70:
             raise ValueError("An address line should have between 0 and 70 characters.")
         self.line2 = (line2 or '').strip()
-        if not (0 <= len(self.line2) <= 70):
+        if len(self.line2) > 70:
             raise ValueError("An address line should have between 0 and 70 characters.")
         self.country = self.parse_country(country)
 
-    def data_list(self):
+    def _data_list(self):
         # 'K': combined address
-        return [
+        return (
             'K', self.name.replace('\n', ' '), self.line1.replace('\n', ' '),
             self.line2.replace('\n', ' '), '', '', self.country
-        ]
+        )
 
-    def as_paragraph(self, max_chars=MAX_CHARS_PAYMENT_LINE):
-        return chain(*(self._split(line, max_chars) for line in [self.name, self.line1, self.line2]))
+    def _lines(self):
+        return (self.name, self.line1, self.line2)
 
 
 class StructuredAddress(Address):
@@ -162,6 +200,7 @@ class StructuredAddress(Address):
     Structured address
     (name, street, house_num, pcode, city, country)
     """
+    __slots__ = ('street', 'house_num', 'pcode', 'city')
     combined = False
 
     def __init__(self, *, name=None, street=None, house_num=None, pcode=None, city=None, country=None):
@@ -186,22 +225,19 @@ class StructuredAddress(Address):
             raise ValueError("A city cannot have more than 35 characters.")
         self.country = self.parse_country(country)
 
-    def data_list(self):
-        """Return address values as a list, appropriate for qr generation."""
+    def _data_list(self):
         # 'S': structured address
-        return [
+        return (
             'S', self.name.replace('\n', ' '), self.street.replace('\n', ' '),
             self.house_num, self.pcode, self.city, self.country
-        ]
+        )
 
-    def as_paragraph(self, max_chars=MAX_CHARS_PAYMENT_LINE):
-        lines = [self.name, "%s-%s %s" % (self.country, self.pcode, self.city)]
+    def _lines(self):
+        lines = [self.name]
         if self.street:
-            if self.house_num:
-                lines.insert(1, " ".join([self.street, self.house_num]))
-            else:
-                lines.insert(1, self.street)
-        return chain(*(self._split(line, max_chars) for line in lines))
+            lines.append(self.street + " " + self.house_num if self.house_num else self.street)
+        lines.append(self.country + "-" + self.pcode + " " + self.city)
+        return tuple(lines)
 
 
 class QRBill:
@@ -248,11 +284,16 @@ class QRBill:
         # Account (IBAN) validation
         if not account:
             raise ValueError("The account parameter is mandatory")
-        if not iban.is_valid(account):
-            raise ValueError("Sorry, the IBAN is not valid")
-        self.account = iban.validate(account)
-        if self.account[:2] not in IBAN_ALLOWED_COUNTRIES:
+        account = iban.compact(account)
+        if account[:2] not in IBAN_ALLOWED_COUNTRIES:
+            try:
+                iban.validate(account)
+            except ValidationError:
+                raise ValueError("Sorry, the IBAN is not valid")
             raise ValueError("IBAN must start with: %s" % ", ".join(IBAN_ALLOWED_COUNTRIES))
+        if not is_valid_ch_iban(account):
+            raise ValueError("Sorry, the IBAN is not valid")
+        self.account = account
         iban_iid = int(self.account[4:9])
         if QR_IID["start"] <= iban_iid <= QR_IID["end"]:
             self.account_is_qriban = True
@@ -266,21 +307,8 @@ class QRBill:
                 raise ValueError("Amount can only be specified as str or Decimal.")
             # remove commonly used thousands separators
             amount = amount.replace("'", "").strip()
-            # people often don't add .00 for amounts without cents/rappen
-            if "." not in amount:
-                amount = amount + ".00"
-            # support lazy people who write 12.1 instead of 12.10
-            if amount[-2] == '.':
-                amount = amount + '0'
-            # strip leading zeros
-            amount = amount.lstrip("0")
-            # some people tend to strip the leading zero on amounts below 1 CHF/EUR
-            # and with removing leading zeros, we would have removed the zero before
-            # the decimal delimiter anyway
-            if amount[0] == ".":
-                amount = "0" + amount
-            m = re.match(AMOUNT_REGEX, amount)
-            if not m:
+            amount = normalize_amount(amount)
+            if not is_valid_amount(amount):
                 raise ValueError(
                     "If provided, the amount must match the pattern '###.##'"
                     " and cannot be larger than 999'999'999.99"
@@ -318,17 +346,23 @@ class QRBill:
         if not reference_number:
             self.ref_type = 'NON'
             self.reference_number = None
+            self._formatted_reference = None
         elif reference_number.strip()[:2].upper() == "RF":
-            if iso11649.is_valid(reference_number):
-                self.ref_type = 'SCOR'
+            try:
                 self.reference_number = iso11649.validate(reference_number)
-            else:
+            except ValidationError:
                 raise ValueError("The reference number is invalid")
-        elif esr.is_valid(reference_number):
-            self.ref_type = 'QRR'
-            self.reference_number = esr.format(reference_number).replace(" ", "")
+            self.ref_type = 'SCOR'
+            self._formatted_reference = (self.reference_number, iso11649.format(self.reference_number))
         else:
-            raise ValueError("The reference number is invalid")
+            try:
+                esr.validate(reference_number)
+            except ValidationError:
+                raise ValueError("The reference number is invalid")
+            self.ref_type = 'QRR'
+            formatted = esr.format(reference_number)
+            self.reference_number = formatted.replace(" ", "")
+            self._formatted_reference = (self.reference_number, formatted)
 
         # A QRR reference number must only be used with a QR-IBAN and
         # with a QR-IBAN, a QRR reference number must be used
@@ -355,57 +389,72 @@ class QRBill:
         self.alt_procs = list(alt_procs)
 
         # Meta-information
-        if language not in ['en', 'de', 'fr', 'it']:
-            raise ValueError("Language should be 'en', 'de', 'fr', or 'it'")
         self.language = language
         self.top_line = top_line
         self.payment_line = payment_line
         self.font_factor = font_factor
+        self._qr_path = None
+
+    @property
+    def language(self):
+        return self._language
+
+    @language.setter
+    def language(self, value):
+        if value not in ['en', 'de', 'fr', 'it']:
+            raise ValueError("Language should be 'en', 'de', 'fr', or 'it'")
+        self._language = value
+        self._labels = LABELS_BY_LANG[value]
 
     @property
     def title_font_info(self):
-        return {'font_size': 12 * self.font_factor, 'font_family': self.font_family, 'font_weight': 'bold'}
+        return {'font_size': 12 * self.font_factor, 'font_weight': 'bold'}
 
     @property
     def font_info(self):
-        return {'font_size': 10 * self.font_factor, 'font_family': self.font_family}
+        return {'font_size': 10 * self.font_factor}
 
     def head_font_info(self, part=None):
         return {
-            'font_size': (8 if part == 'receipt' else 9) * self.font_factor,
-            'font_family': self.font_family, 'font_weight': 'bold'}
+            'font_size': (8 if part == 'receipt' else 9) * self.font_factor, 'font_weight': 'bold'}
 
     @property
     def proc_font_info(self):
-        return {'font_size': 7 * self.font_factor, 'font_family': self.font_family}
+        return {'font_size': 7 * self.font_factor}
 
     def qr_data(self):
         """
         Return data to be encoded in the QR code in the standard text
         representation.
         """
-        values = [self.qr_type or '', self.version or '', self.coding or '', self.account or '']
-        values.extend(self.creditor.data_list())
-        values.extend(self.final_creditor.data_list() if self.final_creditor else [''] * 7)
-        values.extend([self.amount or '', self.currency or ''])
-        values.extend(self.debtor.data_list() if self.debtor else [''] * 7)
-        values.extend([
-            self.ref_type or '',
-            self.reference_number or '',
+        return "\r\n".join((
+            self.qr_type or '', self.version or '', str(self.coding or ''), self.account or '',
+            *self.creditor.data_list(),
+            *(self.final_creditor.data_list() if self.final_creditor else EMPTY_ADDRESS_DATA),
+            self.amount or '', self.currency or '',
+            *(self.debtor.data_list() if self.debtor else EMPTY_ADDRESS_DATA),
+            self.ref_type or '', self.reference_number or '',
             replace_linebreaks(self.additional_information),
-        ])
-        values.append('EPD')
-        values.extend(self.alt_procs)
-        return "\r\n".join([str(v) for v in values])
+            'EPD',
+            *self.alt_procs,
+        ))
 
     def qr_image(self):
-        factory = qrcode.image.svg.SvgPathImage
-        return qrcode.make(
-            self.qr_data(),
-            image_factory=factory,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            border=0,
-        )
+        """Return the QR code as a qrcode SvgPathImage."""
+        # Imported here, as only rendering needs the qrcode library.
+        import qrcode.image.svg
+
+        return make_qr_code(self.qr_data()).make_image(image_factory=qrcode.image.svg.SvgPathImage)
+
+    def qr_path(self):
+        """
+        Return the QR code SVG path data and its width (in QR modules). The
+        result is cached as long as the bill data does not change.
+        """
+        data = self.qr_data()
+        if self._qr_path is None or self._qr_path[0] != data:
+            self._qr_path = (data, *qr_path_data(data))
+        return self._qr_path[1:]
 
     def draw_swiss_cross(self, dwg, grp, origin, size):
         """
@@ -441,26 +490,24 @@ class QRBill:
 
     def draw_blank_rect(self, dwg, grp, x, y, width, height):
         """Draw a empty blank rect with corners (e.g. amount, debtor)"""
+        left, right = x, add_mm(x, width)
+        top, bottom = y, add_mm(y, height)
+        h_line, v_line = mm(3), mm(2)
+        # All four corners as subpaths of a single path element
+        corners = (
+            (left, add_mm(top, v_line), left, top, add_mm(left, h_line), top),
+            (add_mm(right, -h_line), top, right, top, right, add_mm(top, v_line)),
+            (left, add_mm(bottom, -v_line), left, bottom, add_mm(left, h_line), bottom),
+            (add_mm(right, -h_line), bottom, right, bottom, right, add_mm(bottom, -v_line)),
+        )
         # 0.75pt ~= 0.26mm
-        stroke_info = {'stroke': 'black', 'stroke_width': '0.26mm', 'stroke_linecap': 'square'}
-        rect_grp = grp.add(dwg.g())
-        rect_grp.add(dwg.line((x, y), (x, add_mm(y, mm(2))), **stroke_info))
-        rect_grp.add(dwg.line((x, y), (add_mm(x, mm(3)), y), **stroke_info))
-        rect_grp.add(dwg.line((x, add_mm(y, height)), (x, add_mm(y, height, mm(-2))), **stroke_info))
-        rect_grp.add(dwg.line((x, add_mm(y, height)), (add_mm(x, mm(3)), add_mm(y, height)), **stroke_info))
-        rect_grp.add(dwg.line((add_mm(x, width, mm(-3)), y), (add_mm(x, width), y), **stroke_info))
-        rect_grp.add(dwg.line((add_mm(x, width), y), (add_mm(x, width), add_mm(y, mm(2))), **stroke_info))
-        rect_grp.add(dwg.line(
-            (add_mm(x, width, mm(-3)), add_mm(y, height)), (add_mm(x, width), add_mm(y, height)),
-            **stroke_info
-        ))
-        rect_grp.add(dwg.line(
-            (add_mm(x, width), add_mm(y, height)), (add_mm(x, width), add_mm(y, height, mm(-2))),
-            **stroke_info
+        grp.add(dwg.path(
+            d=' '.join('M %s,%s L %s,%s L %s,%s' % corner for corner in corners),
+            stroke='black', stroke_width='0.26mm', stroke_linecap='square', fill='none',
         ))
 
     def label(self, txt):
-        return txt if self.language == 'en' else LABELS[txt][self.language]
+        return self._labels[txt]
 
     def as_svg(self, file_out, full_page=False):
         """
@@ -468,16 +515,19 @@ class QRBill:
         file_out can be a str, a pathlib.Path or a file-like object open in text
         mode.
         """
+        # Imported here, as only rendering needs the svgwrite library.
+        import svgwrite
+
         if full_page:
             dwg = svgwrite.Drawing(
                 size=A4,
-                viewBox=('0 0 %f %f' % (mm(A4[0]), mm(A4[1]))),
+                viewBox=_FULL_PAGE_VIEWBOX,
                 debug=False,
             )
         else:
             dwg = svgwrite.Drawing(
                 size=(A4[0], f'{BILL_HEIGHT}mm'),  # A4 width, A6 height.
-                viewBox=('0 0 %f %f' % (mm(A4[0]), mm(BILL_HEIGHT))),
+                viewBox=_BILL_VIEWBOX,
                 debug=False,
             )
         dwg.add(dwg.rect(insert=(0, 0), size=('100%', '100%'), fill='white'))  # Force white background
@@ -499,11 +549,11 @@ class QRBill:
         :param dwg: The svg drawing.
         :param bill: The svg group containing regular sized bill drawing.
         """
-        y_offset = mm(A4[1]) - mm(BILL_HEIGHT)
+        y_offset = _A4_UU[1] - _BILL_HEIGHT_UU
         bill.translate(tx=0, ty=y_offset)
 
         # add text snippet
-        x_center = mm(A4[0]) / 2
+        x_center = _A4_UU[0] / 2
         y_pos = y_offset - mm(1)
 
         dwg.add(dwg.text(
@@ -511,49 +561,60 @@ class QRBill:
             (x_center, y_pos),
             text_anchor="middle",
             font_style="italic",
+            font_family=self.font_family,
             **self.font_info)
         )
 
     def draw_bill(self, dwg, horiz_scissors=True):
         """Draw the bill in SVG format."""
-        margin = mm(5)
-        payment_left = add_mm(RECEIPT_WIDTH, margin)
-        payment_detail_left = add_mm(payment_left, mm(46 + 5))
+        # Layout coordinates are computed in user units (floats)
+        receipt_width = _RECEIPT_WIDTH_UU
+        margin = _MARGIN_UU
+        payment_left = _PAYMENT_LEFT_UU
+        payment_detail_left = _PAYMENT_DETAIL_LEFT_UU
         above_padding = 1  # 1mm added for scissors display
         currency_top = mm(72 + above_padding)
-
-        grp = dwg.add(dwg.g())
+        # Both printed on the receipt and on the payment part
+        account = format_iban(self.account)
+        ref_number = format_ref_number(self)
+
+        # Texts inherit the font family from the bill group
+        grp = dwg.add(dwg.g(font_family=self.font_family))
+        # Bound once, as they are called for each element of the bill
+        add, text = grp.add, dwg.text
+        font_info = self.font_info
+        title_font_info = self.title_font_info
         # Receipt
         y_pos = 15 + above_padding
         line_space = 3.5
         receipt_head_font = self.head_font_info(part='receipt')
-        grp.add(dwg.text(self.label("Receipt"), (margin, mm(y_pos - 5)), **self.title_font_info))
-        grp.add(dwg.text(self.label("Account / Payable to"), (margin, mm(y_pos)), **receipt_head_font))
+        add(text(self.label("Receipt"), (margin, mm(y_pos - 5)), **title_font_info))
+        add(text(self.label("Account / Payable to"), (margin, mm(y_pos)), **receipt_head_font))
         y_pos += line_space
-        grp.add(dwg.text(
-            iban.format(self.account), (margin, mm(y_pos)), **self.font_info
+        add(text(
+            account, (margin, mm(y_pos)), **font_info
         ))
         y_pos += line_space
         for line_text in self.creditor.as_paragraph(max_chars=MAX_CHARS_RECEIPT_LINE):
-            grp.add(dwg.text(line_text, (margin, mm(y_pos)), **self.font_info))
+            add(text(line_text, (margin, mm(y_pos)), **font_info))
             y_pos += line_space
 
         if self.reference_number:
             y_pos += 1
-            grp.add(dwg.text(self.label("Reference"), (margin, mm(y_pos)), **receipt_head_font))
+            add(text(self.label("Reference"), (margin, mm(y_pos)), **receipt_head_font))
             y_pos += line_space
-            grp.add(dwg.text(format_ref_number(self), (margin, mm(y_pos)), **self.font_info))
+            add(text(ref_number, (margin, mm(y_pos)), **font_info))
             y_pos += line_space
 
         y_pos += 1
-        grp.add(dwg.text(
+        add(text(
             self.label("Payable by") if self.debtor else self.label("Payable by (name/address)"),
             (margin, mm(y_pos)), **receipt_head_font
         ))
         y_pos += line_space
         if self.debtor:
             for line_text in self.debtor.as_paragraph(max_chars=MAX_CHARS_RECEIPT_LINE):
-                grp.add(dwg.text(line_text, (margin, mm(y_pos)), **self.font_info))
+                add(text(line_text, (margin, mm(y_pos)), **font_info))
                 y_pos += line_space
         else:
             self.draw_blank_rect(
@@ -562,14 +623,14 @@ class QRBill:
             )
             y_pos += 28
 
-        grp.add(dwg.text(self.label("Currency"), (margin, currency_top), **receipt_head_font))
-        grp.add(dwg.text(self.label("Amount"), (add_mm(margin, mm(12)), currency_top), **receipt_head_font))
-        grp.add(dwg.text(self.currency, (margin, add_mm(currency_top, mm(5))), **self.font_info))
+        add(text(self.label("Currency"), (margin, currency_top), **receipt_head_font))
+        add(text(self.label("Amount"), (add_mm(margin, mm(12)), currency_top), **receipt_head_font))
+        add(text(self.currency, (margin, add_mm(currency_top, mm(5))), **font_info))
         if self.amount:
-            grp.add(dwg.text(
+            add(text(
                 format_amount(self.amount),
                 (add_mm(margin, mm(12)), add_mm(currency_top, mm(5))),
-                **self.font_info
+                **font_info
             ))
         else:
             self.draw_blank_rect(
@@ -578,16 +639,16 @@ class QRBill:
             )
 
         # Right-aligned
-        grp.add(dwg.text(
-            self.label("Acceptance point"), (add_mm(RECEIPT_WIDTH, margin * -1), mm(86 + above_padding)),
+        add(text(
+            self.label("Acceptance point"), (add_mm(receipt_width, margin * -1), mm(86 + above_padding)),
             text_anchor='end', **receipt_head_font
         ))
 
         # Top separation line
         if self.top_line:
-            grp.add(dwg.line(
+            add(dwg.line(
                 start=(0, mm(0.141 + above_padding)),
-                end=(add_mm(RECEIPT_WIDTH, PAYMENT_WIDTH), mm(0.141 + above_padding)),
+                end=(add_mm(receipt_width, _PAYMENT_WIDTH_UU), mm(0.141 + above_padding)),
                 stroke='black', stroke_dasharray='2 2', fill='none'
             ))
             if horiz_scissors:
@@ -598,13 +659,13 @@ class QRBill:
                 )
                 path.scale(1.9)
                 path.translate(tx=24, ty=0)
-                grp.add(path)
+                add(path)
 
         # Separation line between receipt and payment parts
         if self.payment_line:
-            grp.add(dwg.line(
-                start=(mm(RECEIPT_WIDTH), mm(above_padding)),
-                end=(mm(RECEIPT_WIDTH), mm(BILL_HEIGHT - above_padding)),
+            add(dwg.line(
+                start=(receipt_width, mm(above_padding)),
+                end=(receipt_width, mm(BILL_HEIGHT - above_padding)),
                 stroke='black', stroke_dasharray='2 2', fill='none'
             ))
             # Scissors on vertical line
@@ -615,51 +676,42 @@ class QRBill:
             path.scale(1.9)
             path.translate(tx=118, ty=40)
             path.rotate(90)
-            grp.add(path)
+            add(path)
 
         # Payment part
         payment_head_font = self.head_font_info(part='payment')
-        grp.add(dwg.text(self.label("Payment part"), (payment_left, mm(10 + above_padding)), **self.title_font_info))
-
-        # Get QR code SVG from qrcode lib, read it and redraw path in svgwrite drawing.
-        buff = BytesIO()
-        im = self.qr_image()
-        im.save(buff)
-        m = re.search(r'<path [^>]*>', buff.getvalue().decode())
-        if not m:
-            raise Exception("Unable to extract path data from the QR code SVG image")
-        m = re.search(r' d=\"([^\"]*)\"', m.group())
-        if not m:
-            raise Exception("Unable to extract path d attributes from the SVG QR code source")
-        path_data = m.groups()[0]
+        add(text(self.label("Payment part"), (payment_left, mm(10 + above_padding)), **title_font_info))
+
+        # Redraw the QR code path in svgwrite drawing.
+        path_data, qr_width = self.qr_path()
         path = dwg.path(
             d=path_data,
             style="fill:#000000;fill-opacity:1;fill-rule:nonzero;stroke:none",
         )
 
         # Limit scaling to max dimension (specs says 46mm, keep a bit of margin)
-        scale_factor = mm(45.8) / im.width
+        scale_factor = mm(45.8) / qr_width
 
         qr_left = payment_left
         qr_top = 60 + above_padding
         path.translate(tx=qr_left, ty=qr_top)
         path.scale(scale_factor)
-        grp.add(path)
+        add(path)
 
-        self.draw_swiss_cross(dwg, grp, (payment_left, qr_top), im.width * scale_factor)
+        self.draw_swiss_cross(dwg, grp, (payment_left, qr_top), qr_width * scale_factor)
 
-        grp.add(dwg.text(self.label("Currency"), (payment_left, currency_top), **payment_head_font))
-        grp.add(dwg.text(self.label("Amount"), (add_mm(payment_left, mm(12)), currency_top), **payment_head_font))
-        grp.add(dwg.text(self.currency, (payment_left, add_mm(currency_top, mm(5))), **self.font_info))
+        add(text(self.label("Currency"), (payment_left, currency_top), **payment_head_font))
+        add(text(self.label("Amount"), (add_mm(payment_left, mm(12)), currency_top), **payment_head_font))
+        add(text(self.currency, (payment_left, add_mm(currency_top, mm(5))), **font_info))
         if self.amount:
-            grp.add(dwg.text(
+            add(text(
                 format_amount(self.amount),
                 (add_mm(payment_left, mm(12)), add_mm(currency_top, mm(5))),
-                **self.font_info
+                **font_info
             ))
         else:
             self.draw_blank_rect(
-                dwg, grp, x=add_mm(RECEIPT_WIDTH, margin, mm(12)), y=add_mm(currency_top, mm(3)),
+                dwg, grp, x=add_mm(receipt_width, margin, mm(12)), y=add_mm(currency_top, mm(3)),
                 width=mm(40), height=mm(15)
             )
 
@@ -667,27 +719,27 @@ class QRBill:
         y_pos = 10 + above_padding
         line_space = 3.5
 
-        def add_header(text, first=False):
-            nonlocal dwg, grp, payment_detail_left, y_pos
+        def add_header(header, first=False):
+            nonlocal y_pos
             if not first:
                 y_pos += 3
-            grp.add(dwg.text(text, (payment_detail_left, mm(y_pos)), **payment_head_font))
+            add(text(header, (payment_detail_left, mm(y_pos)), **payment_head_font))
             y_pos += line_space
 
         add_header(self.label("Account / Payable to"), first=True)
-        grp.add(dwg.text(
-            iban.format(self.account), (payment_detail_left, mm(y_pos)), **self.font_info
+        add(text(
+            account, (payment_detail_left, mm(y_pos)), **font_info
         ))
         y_pos += line_space
 
         for line_text in self.creditor.as_paragraph():
-            grp.add(dwg.text(line_text, (payment_detail_left, mm(y_pos)), **self.font_info))
+            add(text(line_text, (payment_detail_left, mm(y_pos)), **font_info))
             y_pos += line_space
 
         if self.reference_number:
             add_header(self.label("Reference"))
-            grp.add(dwg.text(
-                format_ref_number(self), (payment_detail_left, mm(y_pos)), **self.font_info
+            add(text(
+                ref_number, (payment_detail_left, mm(y_pos)), **font_info
             ))
             y_pos += line_space
 
@@ -700,13 +752,13 @@ class QRBill:
                 additional_information = [self.additional_information]
             # TODO: handle line breaks for long infos (mandatory 5mm margin)
             for info in wrap_infos(additional_information):
-                grp.add(dwg.text(info, (payment_detail_left, mm(y_pos)), **self.font_info))
+                add(text(info, (payment_detail_left, mm(y_pos)), **font_info))
                 y_pos += line_space
 
         if self.debtor:
             add_header(self.label("Payable by"))
             for line_text in self.debtor.as_paragraph():
-                grp.add(dwg.text(line_text, (payment_detail_left, mm(y_pos)), **self.font_info))
+                add(text(line_text, (payment_detail_left, mm(y_pos)), **font_info))
                 y_pos += line_space
         else:
             add_header(self.label("Payable by (name/address)"))
@@ -718,15 +770,15 @@ class QRBill:
             y_pos += 28
 
         if self.final_creditor:
-            add_header(self.label("In favor of"))
+            add_header(self.label("In favour of"))
             for line_text in self.final_creditor.as_paragraph():
-                grp.add(dwg.text(line_text, (payment_detail_left, mm(y_pos)), **self.font_info))
+                add(text(line_text, (payment_detail_left, mm(y_pos)), **font_info))
                 y_pos += line_space
 
         # Bottom section
         y_pos = mm(94)
         for alt_proc_line in self.alt_procs:
-            grp.add(dwg.text(
+            add(text(
                 alt_proc_line, (payment_left, y_pos), **self.proc_font_info
             ))
             y_pos += mm(2.2)
@@ -737,25 +789,84 @@ def add_mm(*mms):
     """Utility to allow additions of '23mm'-type strings."""
     return round(
         sum(
-            mm(float(m[:-2])) if isinstance(m, str) else m for m in mms
+            mm(m) if isinstance(m, str) else m for m in mms
         ),
         5
     )
 
 
+@lru_cache(maxsize=256)
 def mm(val):
-    """Convert val (as mm, either number of '12mm' str) into user units."""
-    try:
+    """
+    Convert val (as mm, either number of '12mm' str) into user units.
+    Cached, as bills are drawn with a small set of recurring values.
+    """
+    if isinstance(val, str):
         val = float(val.rstrip('mm'))
-    except AttributeError:
-        pass
     return round(val * MM_TO_UU, 5)
 
 
+# Bill and page sizes in user units, so drawing does not re-parse the strings.
+_A4_UU = (mm(A4[0]), mm(A4[1]))
+_BILL_HEIGHT_UU = mm(BILL_HEIGHT)
+_RECEIPT_WIDTH_UU = mm(RECEIPT_WIDTH)
+_PAYMENT_WIDTH_UU = mm(PAYMENT_WIDTH)
+_FULL_PAGE_VIEWBOX = f'0 0 {_A4_UU[0]:f} {_A4_UU[1]:f}'
+_BILL_VIEWBOX = f'0 0 {_A4_UU[0]:f} {_BILL_HEIGHT_UU:f}'
+# Fixed horizontal positions of the bill layout, in user units.
+_MARGIN_UU = mm(5)
+_PAYMENT_LEFT_UU = add_mm(_RECEIPT_WIDTH_UU, _MARGIN_UU)
+_PAYMENT_DETAIL_LEFT_UU = add_mm(_PAYMENT_LEFT_UU, mm(46 + 5))
+
+
+def make_qr_code(data):
+    """Return a qrcode.QRCode encoding data, with the Swiss QR bill settings."""
+    # Imported here, as only rendering needs the qrcode library.
+    import qrcode
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(data)
+    qr.make()
+    return qr
+
+
+def qr_path_data(data):
+    """Return the SVG path data and the width (in QR modules) of the QR code for data."""
+    qr = make_qr_code(data)
+    # One square subpath per dark module, as drawn by qrcode's SvgPathImage,
+    # built from the matrix without going through an image.
+    path_data = ''.join(
+        f'M{x},{y}H{x + 1}V{y + 1}H{x}z'
+        for y, row in enumerate(qr.modules) for x, dark in enumerate(row) if dark
+    )
+    return path_data, qr.modules_count
+
+
+def is_valid_ch_iban(account):
+    """
+    Check a compacted CH/LI IBAN: 21 alphanumeric chars, including a 5-digit
+    institution id, with a valid check digits pair.
+    """
+    if len(account) != 21 or not account.isascii() or not account.isalnum() or not account[2:9].isdigit():
+        return False
+    # Move the country code and check digits at the end, and convert letters to numbers
+    digits = (account[4:] + account[:4]).translate(IBAN_LETTERS_TO_DIGITS)
+    # ISO 7064 mod 97-10, a single big int conversion is fast for IBAN-sized numbers
+    return int(digits) % 97 == 1
+
+
+def format_iban(account):
+    """Format a compacted IBAN in groups of 4 chars, as printed on the bill."""
+    return ' '.join([account[i:i + 4] for i in range(0, len(account), 4)])
+
+
 def format_ref_number(bill):
     if not bill.reference_number:
         return ''
     num = bill.reference_number
+    # Formatted once when the reference number was validated
+    if bill._formatted_reference and bill._formatted_reference[0] == num:
+        return bill._formatted_reference[1]
     if bill.ref_type == "QRR":
         return esr.format(num)
     elif bill.ref_type == "SCOR":
@@ -764,16 +875,43 @@ def format_ref_number(bill):
         return num
 
 
+def normalize_amount(amount):
+    """Complete and clean up an amount string, in a single rebuild."""
+    units, dot, cents = amount.partition('.')
+    if not dot:
+        # people often don't add .00 for amounts without cents/rappen
+        cents = '00'
+    elif len(cents) == 1:
+        # support lazy people who write 12.1 instead of 12.10
+        cents += '0'
+    # strip leading zeros, but keep (or add) one before the decimal delimiter,
+    # as some people tend to strip it on amounts below 1 CHF/EUR
+    return (units.lstrip('0') or '0') + '.' + cents
+
+
+def is_valid_amount(amount):
+    """Check that amount matches '###.##', with 1 to 9 digits before the dot."""
+    dot = amount.find('.')
+    return (
+        0 < dot <= 9 and len(amount) - dot == 3
+        and amount.isascii() and amount[:dot].isdigit() and amount[dot + 1:].isdigit()
+    )
+
+
 def format_amount(amount_):
+    units, _, cents = amount_.partition('.')
+    if len(cents) == 2 and units.isdigit():
+        # Normalized amount ('###.##'), insert a space every 3 digits from the right.
+        head = len(units) % 3 or 3
+        return ' '.join([units[:head]] + [units[i:i + 3] for i in range(head, len(units), 3)]) + '.' + cents
     return '{:,.2f}'.format(float(amount_)).replace(",", " ")
 
 
 def wrap_infos(infos):
     for line in infos:
         for text in line.splitlines():
-            while text:
-                yield text[:MAX_CHARS_PAYMENT_LINE]
-                text = text[MAX_CHARS_PAYMENT_LINE:]
+            for start in range(0, len(text), MAX_CHARS_PAYMENT_LINE):
+                yield text[start:start + MAX_CHARS_PAYMENT_LINE]
 
 
 def replace_linebreaks(text):
@@ -23,6 +23,19 @@ class AddressTests(unittest.TestCase):
         addr = Address.create(name='  {}  '.format('a' * 70), **defaults)
         self.assertEqual(addr.name, 'a' * 70)
 
+    def test_structured_limits(self):
+        defaults = {'name': 'Jane', 'pcode': '1234', 'city': 'Somewhere'}
+        for field, value, err_msg in [
+            ('street', 'a' * 71, "A street cannot have more than 70 characters."),
+            ('house_num', '1' * 17, "A house number cannot have more than 16 characters."),
+            ('pcode', ' ', "Postal code is mandatory"),
+            ('pcode', '1' * 17, "A postal code cannot have more than 16 characters."),
+            ('city', '', "City is mandatory"),
+            ('city', 'a' * 36, "A city cannot have more than 35 characters."),
+        ]:
+            with self.assertRaisesRegex(ValueError, err_msg):
+                Address.create(**{**defaults, field: value})
+
     def test_combined(self):
         err_msg = "line2 is mandatory for combined address type."
         with self.assertRaisesRegex(ValueError, err_msg):
@@ -56,11 +69,11 @@ class AddressTests(unittest.TestCase):
         )
         self.assertEqual(
             addr.data_list(),
-            [
+            (
                 'K', 'A long name line with forced newline position',
                 'A long street line with forced newline position',
                 'Second line', '', '', 'CH',
-            ]
+            )
         )
         self.assertEqual(
             list(addr.as_paragraph()),
@@ -78,11 +91,11 @@ class AddressTests(unittest.TestCase):
         )
         self.assertEqual(
             addr.data_list(),
-            [
+            (
                 'S', 'A long name line with forced newline position',
                 'A long street line with forced newline position', '',
                 '2735', 'Bévilard', 'CH',
-            ]
+            )
         )
         self.assertEqual(
             list(addr.as_paragraph()),
@@ -93,6 +106,16 @@ class AddressTests(unittest.TestCase):
             ]
         )
 
+    def test_representations(self):
+        addr = Address.create(name='Jane', street='Rue du Lac', pcode='1000', city='Lausanne')
+        self.assertEqual(addr.as_paragraph(), ('Jane', 'Rue du Lac', 'CH-1000 Lausanne'))
+        self.assertEqual(addr.as_paragraph(max_chars=10), ('Jane', 'Rue du Lac', 'CH-1000', 'Lausanne'))
+        # Changing a field is reflected in the QR data and printed lines
+        addr.name = 'Someone Else'
+        addr.house_num = '12'
+        self.assertEqual(addr.data_list()[1:4], ('Someone Else', 'Rue du Lac', '12'))
+        self.assertEqual(addr.as_paragraph(), ('Someone Else', 'Rue du Lac 12', 'CH-1000 Lausanne'))
+
 
 class QRBillTests(unittest.TestCase):
     def _produce_svg(self, bill, **kwargs):
@@ -136,6 +159,14 @@ class QRBillTests(unittest.TestCase):
             },
         )
         self.assertEqual(bill.account, "CH5380005000010283664")
+        # Liechtenstein IBAN with letters in the account part
+        bill = QRBill(
+            account="li21 0881 0000 2324 013a a",
+            creditor={
+                'name': 'Jane', 'pcode': '1000', 'city': 'Lausanne', 'country': 'CH',
+            },
+        )
+        self.assertEqual(bill.account, "LI21088100002324013AA")
 
     def test_country(self):
         bill_data = {
@@ -256,7 +287,7 @@ class QRBillTests(unittest.TestCase):
             '1000\r\nLausanne\r\nCH\r\n\r\n\r\n\r\n\r\n\r\n\r\n\r\n\r\nCHF\r\n'
             '\r\n\r\n\r\n\r\n\r\n\r\n\r\nNON\r\n\r\nHello Line break\r\nEPD'
         )
-        with open("test1.svg", 'w') as fh:
+        with tempfile.NamedTemporaryFile(suffix='.svg') as fh:
             bill.as_svg(fh.name)
 
     def test_minimal_data(self):
@@ -277,6 +308,23 @@ class QRBillTests(unittest.TestCase):
             content = fh.read().decode()
         self.assertTrue(content.startswith('<?xml version="1.0" encoding="utf-8" ?>'))
 
+    def test_qr_path_cache(self):
+        bill = QRBill(
+            account="CH 53 8000 5000 0102 83664",
+            creditor={
+                'name': 'Jane', 'pcode': '1000', 'city': 'Lausanne',
+            },
+        )
+        # The drawn path matches the image from qr_image()
+        image = bill.qr_image()
+        path_data, width = bill.qr_path()
+        self.assertEqual(width, image.width)
+        self.assertEqual(path_data, image.path.get('d'))
+        self.assertIs(bill.qr_path()[0], path_data)
+        # Changing bill data produces a new path
+        bill.amount = '12.50'
+        self.assertNotEqual(bill.qr_path()[0], path_data)
+
     def test_ultimate_creditor(self):
         bill_data = {
             'account': "CH 53 8000 5000 0102 83664",
@@ -290,6 +338,20 @@ class QRBillTests(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, "final creditor is reserved for future use, must not be used"):
             QRBill(**bill_data)
 
+    def test_ultimate_creditor_label(self):
+        # The field is not accepted by the constructor, but can still be drawn.
+        bill = QRBill(
+            account="CH 53 8000 5000 0102 83664",
+            creditor={
+                'name': 'Jane', 'pcode': '1000', 'city': 'Lausanne',
+            },
+            language='de',
+        )
+        bill.final_creditor = Address.create(name='John', pcode='2501', city='Biel')
+        content = strip_svg_path(self._produce_svg(bill))
+        self.assertIn('>Zugunsten</text>', content)
+        self.assertIn('>John</text>', content)
+
     def test_spec_example1(self):
         bill = QRBill(
             account='CH4431999123000889012',
@@ -338,8 +400,9 @@ class QRBillTests(unittest.TestCase):
             bill.as_svg(fh.name)
             content = strip_svg_path(fh.read().decode())
         self.assertTrue(content.startswith('<?xml version="1.0" encoding="utf-8" ?>'))
-        font9 = 'font-family="Arial,Helvetica" font-size="9" font-weight="bold"'
-        font10 = 'font-family="Arial,Helvetica" font-size="10"'
+        self.assertIn('<g font-family="Arial,Helvetica">', content)
+        font9 = 'font-size="9" font-weight="bold"'
+        font10 = 'font-size="10"'
         # Test the Payable by section:
         expected = (
             '<text {font9} x="{x}" y="{y1}">Payable by</text>'
@@ -427,6 +490,22 @@ class QRBillTests(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, "A QR-IBAN requires a QRR reference number"):
             bill = QRBill(**min_data, reference_number='RF18539007547034')
 
+    def test_language(self):
+        min_data = {
+            'account': "CH 53 8000 5000 0102 83664",
+            'creditor': {
+                'name': 'Jane', 'pcode': '1000', 'city': 'Lausanne',
+            },
+        }
+        with self.assertRaisesRegex(ValueError, "Language should be 'en', 'de', 'fr', or 'it'"):
+            QRBill(**min_data, language='es')
+        bill = QRBill(**min_data, language='fr')
+        self.assertEqual(bill.label("Receipt"), "Récépissé")
+        bill.language = 'de'
+        self.assertEqual(bill.label("Receipt"), "Empfangsschein")
+        bill.language = 'en'
+        self.assertEqual(bill.label("Receipt"), "Receipt")
+
     def test_alt_procs(self):
         min_data = {
             'account': "CH 53 8000 5000 0102 83664",
@@ -476,17 +555,28 @@ class QRBillTests(unittest.TestCase):
         )
         content = strip_svg_path(self._produce_svg(bill))
         self.assertIn(
-            '<text font-family="{ffamily}" font-size="18.0" font-weight="bold"'
+            '<text font-size="18.0" font-weight="bold"'
             ' x="17.71654" y="{y1}">Receipt</text>'
-            '<text font-family="{ffamily}" font-size="12.0" font-weight="bold"'
+            '<text font-size="12.0" font-weight="bold"'
             ' x="17.71654" y="{y2}">Account / Payable to</text>'
-            '<text font-family="{ffamily}" font-size="15.0" x="17.71654"'
+            '<text font-size="15.0" x="17.71654"'
             ' y="{y3}">CH53 8000 5000 0102 8366 4</text>'.format(
-                ffamily='Arial,Helvetica', y1=mm(11), y2=mm(16), y3=mm(19.5)
+                y1=mm(11), y2=mm(16), y3=mm(19.5)
             ),
             content
         )
 
+    def test_font_family_on_instance(self):
+        bill = QRBill(
+            account="CH 53 8000 5000 0102 83664",
+            creditor={
+                'name': 'Jane', 'pcode': '1000', 'city': 'Lausanne',
+            },
+        )
+        bill.font_family = 'Helvetica'
+        content = strip_svg_path(self._produce_svg(bill))
+        self.assertIn('<g font-family="Helvetica">', content)
+
 
 class CommandLineTests(unittest.TestCase):
     def test_no_args(self):